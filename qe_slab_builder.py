@@ -9,60 +9,391 @@
 import sys
 import os
 import re
+import math
+import stat
 import io
 import json
+import mmap
+import gzip
+import base64
 import shutil
-import filecmp
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 from PySide6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QPushButton, QFileDialog,
     QTabWidget, QLabel, QSpinBox, QDoubleSpinBox, QHBoxLayout, QLineEdit, QComboBox,
-    QTextEdit, QSplitter, QFormLayout, QSizePolicy, QRadioButton, QButtonGroup, QCheckBox
+    QPlainTextEdit, QSplitter, QFormLayout, QSizePolicy, QRadioButton, QButtonGroup, QCheckBox
 )
-from PySide6.QtWebEngineWidgets import QWebEngineView
-from PySide6.QtCore import Qt
-from ase.io import read, write
-from ase.build import surface
-from ase import Atoms
-import py3Dmol
+from PySide6.QtCore import Qt, QCoreApplication, QTimer, QSignalBlocker
+# ase / py3Dmol / QtWebEngine are imported lazily where they are used (faster startup)
+try:
+    import orjson  # optional: faster session save/load
+except ImportError:
+    orjson = None
 
 RY_TO_EV = 13.605693009
 
-def atoms_to_json(atoms):
+# QE .out parsing: compiled once, applied to the whole (mmap'ed) file in bytes mode
+_RE_NATOMS = re.compile(rb'number of atoms\s*/\s*cell\s*=\s*(\d+)', re.I)
+_RE_ETOT = re.compile(rb"^!.*total energy.*?=\s*([+-]?\d+\.\d+(?:[eE][+-]?\d+)?)", re.I | re.M)
+_RE_FLOAT = re.compile(rb'([+-]?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?)')
+# section header line that ends an ATOMIC_POSITIONS block, and a coordinate line inside it
+_RE_SECTION_HDR = re.compile(rb'^[ \t]*[A-Z _0-9()-]+:[ \t\r]*$', re.M)
+_RE_ATPOS_LINE = re.compile(rb'^[ \t]*[A-Za-z][\w-]*[ \t]+[-+]?[\d.]', re.M)
+
+def _json_dumps(obj):
+    """compact JSON bytes (orjson if available)"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(obj, separators=(',', ':')).encode()
+
+def _json_loads(data):
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+# .out.gz files are decompressed and scanned in windows of about this size
+_GZ_CHUNK_SIZE = 1 << 20
+
+def _iter_gzip_windows(filepath, chunk_size=_GZ_CHUNK_SIZE):
+    """
+    Stream a gzipped QE output as bytes windows of about chunk_size.
+    Windows are cut after a blank line (after a newline only if no blank line is
+    seen for 4 chunks), so neither single-line matches nor ATOMIC_POSITIONS
+    blocks are split.
+    """
+    with gzip.open(filepath, 'rb') as f:
+        carry = b''
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            buf = carry + chunk
+            i = buf.rfind(b'\n\n')
+            j = buf.rfind(b'\n\r\n')
+            cut = max(i + 2 if i != -1 else 0, j + 3 if j != -1 else 0)
+            if cut == 0 and len(buf) >= 4 * chunk_size:
+                cut = buf.rfind(b'\n') + 1
+            if cut == 0:
+                carry = buf
+                continue
+            yield buf[:cut]
+            carry = buf[cut:]
+        if carry:
+            yield carry
+
+def _count_atomic_positions(buf):
+    """atom count of the first non-empty ATOMIC_POSITIONS block in buf, or None"""
+    idx = buf.find(b'ATOMIC_POSITIONS')
+    while idx != -1:
+        start = buf.find(b'\n', idx) + 1
+        if start == 0:
+            break
+        # ブロック末尾 = 最初の空行（LF / CRLF）
+        ends = [e for e in (buf.find(b'\n\n', start - 1), buf.find(b'\n\r\n', start - 1)) if e != -1]
+        end = min(ends) if ends else len(buf)
+        # 次セクションの見出し行があればそこまで
+        m_hdr = _RE_SECTION_HDR.search(buf, start, end)
+        block_end = m_hdr.start() if m_hdr else end
+        # 座標行らしい行（元素ラベル + 数値）を一度にカウント
+        count = len(_RE_ATPOS_LINE.findall(buf, start, block_end))
+        if count > 0:
+            return count
+        idx = buf.find(b'ATOMIC_POSITIONS', end)
+    return None
+
+def _energy_fallback(buf):
+    """
+    last number on the last line of buf mentioning 'total energy' (used only if no '!' total
+    energy line, e.g. an unconverged SCF), or None. Other 'energy' lines such as the
+    'kinetic-energy cutoff' header are skipped, so a cutoff is never taken for the energy.
+    """
+    end = len(buf)
+    while True:
+        i = buf.rfind(b'energy', 0, end)
+        if i == -1:
+            return None
+        line_start = buf.rfind(b'\n', 0, i) + 1
+        line_end = buf.find(b'\n', i)
+        if line_end == -1:
+            line_end = len(buf)
+        if b'total energy' in buf[line_start:line_end].lower():
+            found = _RE_FLOAT.findall(buf, line_start, line_end)
+            if found:
+                return float(found[-1])
+        end = line_start
+
+def _scan_qe_output(windows):
+    """
+    Scan QE output given as an iterable of line-aligned bytes-like windows
+    (a single mmap, or the windows of _iter_gzip_windows).
+    returns: (energy_Ry_or_None, natoms_or_None)
+    """
+    energy = None
+    natoms = None
+    ap_natoms = None
+    prev = tail = b''
+    for buf in windows:
+        # 1) number of atoms/cell（大文字小文字混在に対応）
+        if natoms is None:
+            m_n = _RE_NATOMS.search(buf)
+            if m_n:
+                natoms = int(m_n.group(1))
+        # 2) total energy（'!' で始まる行）: relax などでは最後の値が最終エネルギー
+        m_e = None
+        for m_e in _RE_ETOT.finditer(buf):
+            pass
+        if m_e:
+            energy = float(m_e.group(1))
+        # フォールバック用：natoms が未検出の間は ATOMIC_POSITIONS ブロックから数える
+        if natoms is None and ap_natoms is None:
+            ap_natoms = _count_atomic_positions(buf)
+        prev, tail = tail, buf
+
+    if natoms is None:
+        natoms = ap_natoms
+    # 追加のフォールバック：もし energy が未検出なら 'total energy' を含む最後の行の数字を使う（慎重）
+    if energy is None and len(tail):
+        energy = _energy_fallback(prev + tail if len(prev) else tail)
+    return energy, natoms
+
+# tag of the compact structure format written by atoms_to_json
+_ATOMS_JSON_FORMAT = "packed-v1"
+
+def _pack_array(arr, dtype="<f8"):
+    """ndarray -> {"dtype", "shape", "b64"} (raw little-endian bytes, base64 encoded)"""
+    arr = np.ascontiguousarray(arr, dtype=dtype)
+    return {"dtype": dtype, "shape": list(arr.shape), "b64": base64.b64encode(arr.tobytes()).decode("ascii")}
+
+def _unpack_array(data):
+    """inverse of _pack_array"""
+    buf = base64.b64decode(data["b64"])
+    return np.frombuffer(buf, dtype=data["dtype"]).reshape(data["shape"])
+
+# number of serialized structures kept by atoms_to_json(cache=...)
+_ATOMS_JSON_CACHE_SIZE = 8
+# number of rendered viewer scenes kept by SlabApp.update_viewer
+_VIEWER_HTML_CACHE_SIZE = 8
+
+def _atoms_soa(atoms):
+    """
+    Flat (structure-of-arrays) view of atoms: symbols list plus the numbers / pos / cell
+    arrays shared with atoms (not copied), masses and pbc. Built once per structure and used
+    by the viewer, JSON and .in paths instead of going through the Atoms accessors on every call.
+    """
     if atoms is None:
         return None
     return {
         "symbols": atoms.get_chemical_symbols(),
-        "positions": atoms.get_positions().tolist(),
-        "cell": atoms.get_cell().tolist(),
-        "pbc": atoms.get_pbc().tolist()
+        "numbers": atoms.numbers,
+        "pos": atoms.positions,
+        "cell": atoms.cell.array,
+        "masses": atoms.get_masses(),
+        "pbc": tuple(bool(p) for p in atoms.pbc)
+    }
+
+_ATOM_ROW_CHUNK = 4096
+
+def _atom_row_chunks(symbols, pos, fmt="%.8f", chunk=_ATOM_ROW_CHUNK):
+    """
+    'symbol x y z\n' rows as a few large strings, each formatted with a single %-operation
+    over up to chunk atoms: no per-atom format call, and temporaries stay bounded.
+    """
+    row = f"%s {fmt} {fmt} {fmt}\n"
+    for i in range(0, len(symbols), chunk):
+        syms = symbols[i:i + chunk]
+        rows = np.empty((len(syms), 4), dtype=object)
+        rows[:, 0] = syms
+        rows[:, 1:] = pos[i:i + chunk]
+        yield (row * len(syms)) % tuple(rows.ravel().tolist())
+
+def _supercell_xyz(soa, sc):
+    """
+    Extended-XYZ text (with Lattice, for the unit cell box) of soa repeated sc = (sx, sy, sz)
+    times; atom order is the same as ase's Atoms * sc.
+    """
+    cell = soa["cell"]
+    shifts = np.indices(sc).reshape(3, -1).T @ cell
+    pos = (shifts[:, None, :] + soa["pos"][None, :, :]).reshape(-1, 3)
+    symbols = soa["symbols"] * len(shifts)
+    lattice = " ".join(f"{v:.8f}" for v in (cell * np.array(sc)[:, None]).ravel())
+    pbc = " ".join("T" if p else "F" for p in soa["pbc"])
+    header = f'{len(symbols)}\nLattice="{lattice}" Properties=species:S:1:pos:R:3 pbc="{pbc}"\n'
+    # 4 decimals are plenty for display and keep the HTML small
+    return header + "".join(_atom_row_chunks(symbols, pos, "%.4f"))
+
+def _slab_area(cell):
+    """area (Å^2) spanned by the first two cell vectors"""
+    # plain float arithmetic: for 3-vectors numpy's call overhead costs more than the math
+    # (tolist() so the scalars are Python floats, not numpy.float64)
+    (a0, a1, a2), (b0, b1, b2) = cell[0][:3].tolist(), cell[1][:3].tolist()
+    cx = a1 * b2 - a2 * b1
+    cy = a2 * b0 - a0 * b2
+    cz = a0 * b1 - a1 * b0
+    return math.sqrt(cx * cx + cy * cy + cz * cz)
+
+def atoms_to_json(atoms, cache=None, soa=None):
+    """
+    Serialize atoms to a JSON-ready dict (soa: optional _atoms_soa(atoms) to read from).
+    If a cache dict is given, the result is reused as long as the same Atoms
+    object still has the same numbers / positions / cell / pbc.
+    """
+    if atoms is None:
+        return None
+    if soa is None:
+        soa = _atoms_soa(atoms)
+    if cache is not None:
+        sig = (soa["pos"].shape, hash((soa["numbers"].tobytes(), soa["pos"].tobytes(),
+                                     soa["cell"].tobytes(), soa["pbc"])))
+        hit = cache.get(id(atoms))
+        if hit is not None and hit[0] == sig:
+            return hit[1]
+    data = {
+        "format": _ATOMS_JSON_FORMAT,
+        "symbols": soa["symbols"],
+        "positions": _pack_array(soa["pos"]),
+        "cell": _pack_array(soa["cell"]),
+        "pbc": list(soa["pbc"])
     }
+    if cache is not None:
+        cache.pop(id(atoms), None)
+        if len(cache) >= _ATOMS_JSON_CACHE_SIZE:
+            cache.pop(next(iter(cache)))
+        cache[id(atoms)] = (sig, data)
+    return data
 
 def atoms_from_json(data):
     if data is None:
         return None
+    from ase import Atoms
+    if data.get("format") == _ATOMS_JSON_FORMAT:
+        positions = _unpack_array(data["positions"])
+        cell = _unpack_array(data["cell"])
+    else:
+        # older session files: nested lists
+        positions = np.array(data["positions"])
+        cell = np.array(data["cell"])
     return Atoms(
         symbols=data["symbols"],
-        positions=np.array(data["positions"]),
-        cell=np.array(data["cell"]),
+        positions=positions,
+        cell=cell,
         pbc=tuple(data["pbc"])
     )
 
+# preferred pseudopotential extensions (lower case), best first
+_EXT_RANK = {ext: i for i, ext in enumerate(['.upf', '.psp', '.psf', '.pseudo', '.dat'])}
+
+def _file_sha1(path):
+    with open(path, 'rb') as f:
+        if hasattr(hashlib, "file_digest"):  # Python 3.11+
+            return hashlib.file_digest(f, "sha1").digest()
+        h = hashlib.sha1()
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+        return h.digest()
+
+def _same_file_content(a, b):
+    """
+    True if files a and b have identical contents.
+    The same file (same path or hard link: equal st_dev/st_ino) is trivially identical.
+    Like filecmp's shallow mode, equal size + mtime counts as identical without reading
+    (our own copies keep the source mtime); otherwise sizes, then SHA-1 of both, are compared.
+    """
+    st_a, st_b = os.stat(a), os.stat(b)
+    if os.path.samestat(st_a, st_b):
+        return True
+    if st_a.st_size != st_b.st_size:
+        return False
+    if st_a.st_mtime_ns == st_b.st_mtime_ns:
+        return True
+    return _file_sha1(a) == _file_sha1(b)
+
+def _claim_exclusive(dst):
+    """
+    Create dst as an empty file with O_EXCL: an existing file raises FileExistsError
+    instead of being overwritten (no exists/create race).
+    """
+    os.close(os.open(dst, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644))
+
+def _copy_into_claimed(src, dst):
+    """
+    Copy src into dst previously claimed by _claim_exclusive (dst is removed on failure).
+    Only the contents and the timestamps are copied (the mtime is what _same_file_content's
+    shallow check relies on); mode bits / xattrs like copy2 would are not needed for pw.x.
+    """
+    try:
+        shutil.copyfile(src, dst)
+        st = os.stat(src)
+        os.utime(dst, ns=(st.st_atime_ns, st.st_mtime_ns))
+    except BaseException:
+        os.remove(dst)
+        raise
+
+def _claim_pseudo_name(full, dest_dir, claimed):
+    """
+    Choose the name of pseudo file full in dest_dir: the first of basename, base_1.ext,
+    base_2.ext, ... that either already holds an identical file (reused) or is free (claimed,
+    left empty for _copy_into_claimed). claimed maps the names claimed so far in this batch
+    to their sources and is updated in place.
+    Returns (name in dest_dir, reused).
+    """
+    base, ext = os.path.splitext(os.path.basename(full))
+    newname, idx = base + ext, 0
+    while True:
+        try:
+            _claim_exclusive(os.path.join(dest_dir, newname))
+            claimed[newname] = full
+            return newname, False
+        except FileExistsError:
+            pass
+        try:
+            # a placeholder claimed in this batch is still empty: compare with its source
+            if _same_file_content(full, claimed.get(newname) or os.path.join(dest_dir, newname)):
+                return newname, True
+        except OSError:
+            # cannot be read: treat as taken
+            pass
+        idx += 1
+        newname = f"{base}_{idx}{ext}"
+
 class SlabApp(QMainWindow):
     def __init__(self):
         super().__init__()
         self.setWindowTitle("QE Slab Builder & I/O Tool")
         self.bulk = None
         self.slab = None
+        # array views of self.bulk / self.slab, refreshed by _structures_changed()
+        self._bulk_soa = None
+        self._slab_soa = None
+        # bumped by _structures_changed(); part of the viewer cache keys
+        self._structure_gen = 0
+        # x-y area of self.slab, set by build_slab (None: compute on demand)
+        self._slab_area_A2 = None
         self.settings = {}
+        self._atoms_json_cache = {}
+        # path -> ((st_mtime_ns, st_size), atoms); re-loading an unchanged CIF skips the parser
+        self._cif_cache = {}
+        # folder -> (st_mtime_ns, sorted file paths) of pseudopotential search folders
+        self._pp_dir_cache = {}
+        # last folder used per file dialog kind, so dialogs reopen there
+        self._last_dirs = {"cif": "", "qe_out": "", "json": ""}
+        # (generation, mode, sx, sy, sz) -> html; small LRU of rendered viewer scenes
+        self._viewer_html_cache = {}
+        # (generation, mode, sx, sy, sz) currently shown in the viewer
+        self._last_viewer_state = None
+
+        # debounce viewer refreshes: rapid spinbox / radio changes render only once
+        self._viewer_timer = QTimer(self)
+        self._viewer_timer.setSingleShot(True)
+        self._viewer_timer.setInterval(150)
+        self._viewer_timer.timeout.connect(self.update_viewer)
 
         # viewer-only supercell controls
         self.super_x = QSpinBox(); self.super_x.setValue(1)
         self.super_y = QSpinBox(); self.super_y.setValue(1)
         self.super_z = QSpinBox(); self.super_z.setValue(1)
-        self.super_x.valueChanged.connect(self.update_viewer)
-        self.super_y.valueChanged.connect(self.update_viewer)
-        self.super_z.valueChanged.connect(self.update_viewer)
+        self.super_x.valueChanged.connect(self._schedule_viewer_update)
+        self.super_y.valueChanged.connect(self._schedule_viewer_update)
+        self.super_z.valueChanged.connect(self._schedule_viewer_update)
 
         tabs = QTabWidget()
         tabs.addTab(self.parameters_tab(), "Parameters")
@@ -76,8 +407,9 @@ class SlabApp(QMainWindow):
         splitter.setSizes([420, 760])
 
         # Terminal
-        self.terminal = QTextEdit()
+        self.terminal = QPlainTextEdit()
         self.terminal.setReadOnly(True)
+        self.terminal.setMaximumBlockCount(500)  # keep only the latest 500 lines
         self.terminal.setStyleSheet("background-color: black; color: lime; font-family: Consolas;")
         self.terminal.setFixedHeight(110)
 
@@ -368,8 +700,8 @@ class SlabApp(QMainWindow):
         self.rb_group = QButtonGroup()
         self.rb_group.addButton(self.rb_bulk)
         self.rb_group.addButton(self.rb_slab)
-        self.rb_bulk.toggled.connect(self.update_viewer)
-        self.rb_slab.toggled.connect(self.update_viewer)
+        self.rb_bulk.toggled.connect(self._schedule_viewer_update)
+        self.rb_slab.toggled.connect(self._schedule_viewer_update)
 
         radio_layout.addWidget(self.rb_bulk)
         radio_layout.addWidget(self.rb_slab)
@@ -385,16 +717,38 @@ class SlabApp(QMainWindow):
         sc_layout.addStretch(1)
         sc_widget = QWidget(); sc_widget.setLayout(sc_layout)
 
-        self.viewer = QWebEngineView()
-        self.viewer.setMinimumHeight(380)
-        self.viewer.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
+        # QWebEngineView (Chromium start-up) is created after the window is first painted
+        self.viewer = None
+        self._viewer_placeholder = QLabel("Loading 3D viewer…")
+        self._viewer_placeholder.setAlignment(Qt.AlignCenter)
+        self._viewer_placeholder.setMinimumHeight(380)
+        self._viewer_placeholder.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
+        self._viewer_layout = layout
 
         layout.addLayout(radio_layout)
         layout.addWidget(sc_widget)
-        layout.addWidget(self.viewer)
+        layout.addWidget(self._viewer_placeholder)
         widget.setLayout(layout)
+        QTimer.singleShot(0, self._init_webview)
         return widget
 
+    def _init_webview(self):
+        try:
+            from PySide6.QtWebEngineWidgets import QWebEngineView
+            viewer = QWebEngineView()
+            viewer.setMinimumHeight(380)
+            viewer.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
+        except Exception as e:
+            # keep the placeholder, but say why there is no viewer instead of "Loading…"
+            self._viewer_placeholder.setText(f"3D viewer unavailable: {e}")
+            self.log_message(f"[Error] 3D viewer: {e}")
+            return
+        self.viewer = viewer
+        self._viewer_layout.replaceWidget(self._viewer_placeholder, self.viewer)
+        self._viewer_placeholder.deleteLater()
+        self._viewer_placeholder = None
+        self.update_viewer()
+
     def _on_nspin_changed(self, val):
         enabled = (val == 2)
         self.start_mag_1.setEnabled(enabled)
@@ -406,15 +760,33 @@ class SlabApp(QMainWindow):
             self.start_mag_2.setValue(0.0)
             self.start_mag_3.setValue(0.0)
 
+    def _structures_changed(self):
+        # call after replacing self.bulk / self.slab
+        self._bulk_soa = _atoms_soa(self.bulk)
+        self._slab_soa = _atoms_soa(self.slab)
+        self._structure_gen += 1
+
     def log_message(self, msg):
-        self.terminal.append(msg)
+        self.terminal.appendPlainText(msg)
         print(msg)
 
     def load_cif(self):
         try:
-            file, _ = QFileDialog.getOpenFileName(self, "Open CIF", "", "CIF Files (*.cif)")
+            file, _ = QFileDialog.getOpenFileName(self, "Open CIF", self._last_dirs["cif"], "CIF Files (*.cif)")
             if file:
-                self.bulk = read(file)
+                self._last_dirs["cif"] = os.path.dirname(file)
+                st = os.stat(file)
+                sig = (st.st_mtime_ns, st.st_size)
+                hit = self._cif_cache.get(file)
+                if hit is not None and hit[0] == sig:
+                    # hand out a copy so the cached structure is never mutated
+                    self.bulk = hit[1].copy()
+                else:
+                    from ase.io import read
+                    atoms = read(file)
+                    self._cif_cache[file] = (sig, atoms.copy())
+                    self.bulk = atoms
+                self._structures_changed()
                 self.file_label.setText(f"CIF: {file}")
                 self.log_message(f"Loaded CIF: {file}")
                 self.update_viewer()
@@ -426,12 +798,16 @@ class SlabApp(QMainWindow):
             if self.bulk is None:
                 self.log_message("Error: No bulk structure loaded.")
                 return
+            from ase.build import surface
             self.slab = surface(
                 self.bulk,
                 (self.h.value(), self.k.value(), self.l.value()),
                 self.layers.value(),
                 vacuum=self.vacuum.value()
             )
+            self._structures_changed()
+            # the slab cell is fixed from here on; keep its area for the surface energy
+            self._slab_area_A2 = _slab_area(self.slab.cell.array)
             self.log_message("Slab built/updated successfully.")
             self.update_viewer()
         except Exception as e:
@@ -444,8 +820,10 @@ class SlabApp(QMainWindow):
                 return
             sx, sy, sz = self.super_x.value(), self.super_y.value(), self.super_z.value()
             slab_to_save = self.slab * (sx, sy, sz) if (sx > 1 or sy > 1 or sz > 1) else self.slab
-            file, _ = QFileDialog.getSaveFileName(self, "Save Slab CIF", "", "CIF Files (*.cif)")
+            file, _ = QFileDialog.getSaveFileName(self, "Save Slab CIF", self._last_dirs["cif"], "CIF Files (*.cif)")
             if file:
+                self._last_dirs["cif"] = os.path.dirname(file)
+                from ase.io import write
                 write(file, slab_to_save)
                 self.log_message(f"Slab saved to: {file} (supercell: {sx},{sy},{sz})")
         except Exception as e:
@@ -453,13 +831,14 @@ class SlabApp(QMainWindow):
 
     def save_settings(self):
         try:
-            file, _ = QFileDialog.getSaveFileName(self, "Save Data", "", "JSON Files (*.json)")
+            file, _ = QFileDialog.getSaveFileName(self, "Save Data", self._last_dirs["json"], "JSON Files (*.json)")
             if not file:
                 return
+            self._last_dirs["json"] = os.path.dirname(file)
             self.settings = {
                 "structures": {
-                    "bulk": atoms_to_json(self.bulk),
-                    "slab": atoms_to_json(self.slab)
+                    "bulk": atoms_to_json(self.bulk, self._atoms_json_cache, self._bulk_soa),
+                    "slab": atoms_to_json(self.slab, self._atoms_json_cache, self._slab_soa)
                 },
                 "miller_index": [self.h.value(), self.k.value(), self.l.value()],
                 "layers": self.layers.value(),
@@ -490,75 +869,95 @@ class SlabApp(QMainWindow):
                 },
                 "results": self.settings.get("results", {})
             }
-            with open(file, "w") as f:
-                json.dump(self.settings, f, indent=2)
+            with open(file, "wb", buffering=1 << 20) as f:
+                f.write(_json_dumps(self.settings))
             self.log_message(f"Data saved to {file}")
         except Exception as e:
             self.log_message(f"[Error] save_settings: {e}")
 
     def load_settings(self):
         try:
-            file, _ = QFileDialog.getOpenFileName(self, "Load Data", "", "JSON Files (*.json)")
+            file, _ = QFileDialog.getOpenFileName(self, "Load Data", self._last_dirs["json"], "JSON Files (*.json)")
             if not file:
                 return
-            with open(file) as f:
-                self.settings = json.load(f)
+            self._last_dirs["json"] = os.path.dirname(file)
+            with open(file, "rb") as f:
+                self.settings = _json_loads(f.read())
             s = self.settings
 
             self.bulk = atoms_from_json(s["structures"]["bulk"])
             self.slab = atoms_from_json(s["structures"]["slab"])
-
-            self.h.setValue(s["miller_index"][0])
-            self.k.setValue(s["miller_index"][1])
-            self.l.setValue(s["miller_index"][2])
-            self.layers.setValue(s["layers"])
-            self.vacuum.setValue(s["vacuum"])
-            sc = s.get("supercell", [1, 1, 1])
-            self.super_x.setValue(sc[0]); self.super_y.setValue(sc[1]); self.super_z.setValue(sc[2])
-
-            qe = s["qe_input"]
-            self.calculation.setCurrentText(qe.get("calculation", "scf"))
-            self.ecutwfc.setValue(qe.get("ecutwfc", 40))
-            self.ecutrho.setValue(qe.get("ecutrho", 400))
-            kpts = qe.get("kpoints", [4,4,1])
-            self.kx.setValue(kpts[0]); self.ky.setValue(kpts[1]); self.kz.setValue(kpts[2])
-            self.override_kpoints.setChecked(qe.get("override_kpoints", False))
-            self.prefix.setText(qe.get("prefix", "qe_calc"))
-            self.pp_search_folder.setText(qe.get("pp_search_folder", ""))
-            self.pp_input_folder.setText(qe.get("pp_input_folder", "./pseudo"))
-            self.copy_pseudos_checkbox.setChecked(qe.get("copy_pseudos", False))
-            self.outdir.setText(qe.get("outdir", "./out"))
-            self.conv_thr.setValue(qe.get("conv_thr", 1e-8))
-            self.occupations.setCurrentText(qe.get("occupations", "fixed"))
-            self.smearing.setCurrentText(qe.get("smearing", "gaussian"))
-            self.degauss.setValue(qe.get("degauss", 0.01))
-            self.nspin.setValue(qe.get("nspin", 1))
-            self.nbnd.setValue(qe.get("nbnd", 0))
-            mags = qe.get("starting_mags", [0.0,0.0,0.0])
-            self.vdw_corr.setCurrentText(qe.get("vdw_corr", "none"))
-            self.london_s6.setValue(qe.get("london_s6", 1.0))
-            self.london_rcut.setValue(qe.get("london_rcut", 16.0))
-
-            self.start_mag_1.setValue(mags[0] if len(mags)>0 else 0.0)
-            self.start_mag_2.setValue(mags[1] if len(mags)>1 else 0.0)
-            self.start_mag_3.setValue(mags[2] if len(mags)>2 else 0.0)
-            # ensure enabled/disabled matches nspin
-            self._on_nspin_changed(self.nspin.value())
-            # --- restore results if available ---
-            results = s.get("results", {})
-            if "bulk_energy_eV" in results and "bulk_energy_Ry" in results:
-                self.bulk_energy_label.setText(
-                    f"Bulk energy = {results['bulk_energy_eV']:.6f} eV ( {results['bulk_energy_Ry']:.6f} Ry )"
-                )
-            if "slab_energy_eV" in results and "slab_energy_Ry" in results:
-                self.slab_energy_label.setText(
-                    f"Slab energy = {results['slab_energy_eV']:.6f} eV ( {results['slab_energy_Ry']:.6f} Ry )"
-                )
-            if "surface_energy_eV_per_A2" in results:
-                self.surface_energy_label.setText(
-                    f"Surface energy = {results['surface_energy_eV_per_A2']:.6f} eV/Å²"
-                )
-
+            self._structures_changed()
+            self._slab_area_A2 = None
+
+            # restore widgets in one batch: no per-widget signals (nspin / supercell handlers)
+            # and no repaint until everything is set; viewer is refreshed once below
+            restored = (
+                self.h, self.k, self.l, self.layers, self.vacuum,
+                self.super_x, self.super_y, self.super_z,
+                self.calculation, self.ecutwfc, self.ecutrho, self.kx, self.ky, self.kz,
+                self.override_kpoints, self.prefix, self.pp_search_folder, self.pp_input_folder,
+                self.copy_pseudos_checkbox, self.outdir, self.conv_thr, self.occupations,
+                self.smearing, self.degauss, self.nspin, self.nbnd, self.vdw_corr,
+                self.london_s6, self.london_rcut, self.start_mag_1, self.start_mag_2, self.start_mag_3,
+            )
+            self.setUpdatesEnabled(False)
+            blockers = [QSignalBlocker(w) for w in restored]
+            try:
+                self.h.setValue(s["miller_index"][0])
+                self.k.setValue(s["miller_index"][1])
+                self.l.setValue(s["miller_index"][2])
+                self.layers.setValue(s["layers"])
+                self.vacuum.setValue(s["vacuum"])
+                sc = s.get("supercell", [1, 1, 1])
+                self.super_x.setValue(sc[0]); self.super_y.setValue(sc[1]); self.super_z.setValue(sc[2])
+
+                qe = s["qe_input"]
+                self.calculation.setCurrentText(qe.get("calculation", "scf"))
+                self.ecutwfc.setValue(qe.get("ecutwfc", 40))
+                self.ecutrho.setValue(qe.get("ecutrho", 400))
+                kpts = qe.get("kpoints", [4,4,1])
+                self.kx.setValue(kpts[0]); self.ky.setValue(kpts[1]); self.kz.setValue(kpts[2])
+                self.override_kpoints.setChecked(qe.get("override_kpoints", False))
+                self.prefix.setText(qe.get("prefix", "qe_calc"))
+                self.pp_search_folder.setText(qe.get("pp_search_folder", ""))
+                self.pp_input_folder.setText(qe.get("pp_input_folder", "./pseudo"))
+                self.copy_pseudos_checkbox.setChecked(qe.get("copy_pseudos", False))
+                self.outdir.setText(qe.get("outdir", "./out"))
+                self.conv_thr.setValue(qe.get("conv_thr", 1e-8))
+                self.occupations.setCurrentText(qe.get("occupations", "fixed"))
+                self.smearing.setCurrentText(qe.get("smearing", "gaussian"))
+                self.degauss.setValue(qe.get("degauss", 0.01))
+                self.nspin.setValue(qe.get("nspin", 1))
+                self.nbnd.setValue(qe.get("nbnd", 0))
+                mags = qe.get("starting_mags", [0.0,0.0,0.0])
+                self.vdw_corr.setCurrentText(qe.get("vdw_corr", "none"))
+                self.london_s6.setValue(qe.get("london_s6", 1.0))
+                self.london_rcut.setValue(qe.get("london_rcut", 16.0))
+
+                self.start_mag_1.setValue(mags[0] if len(mags)>0 else 0.0)
+                self.start_mag_2.setValue(mags[1] if len(mags)>1 else 0.0)
+                self.start_mag_3.setValue(mags[2] if len(mags)>2 else 0.0)
+                # ensure enabled/disabled matches nspin
+                self._on_nspin_changed(self.nspin.value())
+                # --- restore results if available ---
+                results = s.get("results", {})
+                if "bulk_energy_eV" in results and "bulk_energy_Ry" in results:
+                    self.bulk_energy_label.setText(
+                        f"Bulk energy = {results['bulk_energy_eV']:.6f} eV ( {results['bulk_energy_Ry']:.6f} Ry )"
+                    )
+                if "slab_energy_eV" in results and "slab_energy_Ry" in results:
+                    self.slab_energy_label.setText(
+                        f"Slab energy = {results['slab_energy_eV']:.6f} eV ( {results['slab_energy_Ry']:.6f} Ry )"
+                    )
+                if "surface_energy_eV_per_A2" in results:
+                    self.surface_energy_label.setText(
+                        f"Surface energy = {results['surface_energy_eV_per_A2']:.6f} eV/Å²"
+                    )
+            finally:
+                for blocker in blockers:
+                    blocker.unblock()
+                self.setUpdatesEnabled(True)
 
             self.log_message(f"Data loaded from {file}")
             self.update_viewer()
@@ -569,68 +968,21 @@ class SlabApp(QMainWindow):
     def _parse_qe_out_file(self, filepath):
         """
         QE .out から total energy (Ry) と number of atoms を抽出するヘルパー。
+        通常のファイルは mmap してバッファ全体を一度だけ走査し、
+        .gz は 1 MiB 単位でストリーム展開しながら走査する（メモリ使用量はファイルサイズに依存しない）。
         戻り値: (energy_Ry_or_None, natoms_or_None)
         """
-        energy = None
-        natoms = None
         try:
-            with open(filepath, 'r', encoding='utf-8', errors='ignore') as f:
-                lines = f.readlines()
+            if filepath.lower().endswith('.gz'):
+                return _scan_qe_output(_iter_gzip_windows(filepath))
+            with open(filepath, 'rb') as f:
+                if os.fstat(f.fileno()).st_size == 0:
+                    return None, None
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    return _scan_qe_output((mm,))
         except Exception as e:
-            self.log_message(f"[Error] could not open {filepath}: {e}")
+            self.log_message(f"[Error] could not read {filepath}: {e}")
             return None, None
-    
-        # 1) number of atoms/cell を探す（大文字小文字混在に対応）
-        for line in lines:
-            m_n = re.search(r'number of atoms\s*/\s*cell\s*=\s*(\d+)', line, flags=re.I)
-            if m_n:
-                try:
-                    natoms = int(m_n.group(1))
-                    break
-                except:
-                    natoms = None
-
-        # 2) total energy を探す（'!' を含む行）
-        for line in lines:
-            if '!' in line and 'total energy' in line.lower():
-                m_e = re.search(r'=\s*([+-]?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?)', line)
-                if m_e:
-                    try:
-                        energy = float(m_e.group(1))
-                    except:
-                        energy = None
-                break
-
-        # フォールバック：ATOMIC_POSITIONS ブロックから原子数をカウント
-        if natoms is None:
-            for i, line in enumerate(lines):
-                if 'ATOMIC_POSITIONS' in line.upper():
-                    count = 0
-                    for j in range(i+1, len(lines)):
-                        l = lines[j].strip()
-                        if l == '' or re.match(r'^[A-Z _0-9()-]+:$', l):  # 空行か次セクションの可能性
-                            break
-                        # 行が座標行らしければカウント
-                        toks = l.split()
-                        if len(toks) >= 4:
-                            count += 1
-                    if count > 0:
-                        natoms = count
-                        break
-
-        # 最終フォールバック：出力内の "atomic positions" 表示などが無かったら None のまま
-        # 追加のフォールバック：もし energy が未検出なら最後に数字が出てくる行の数字を使う（慎重）
-        if energy is None:
-            for line in reversed(lines[-200:]):  # 最後の 200 行だけ拾う
-                found = re.findall(r'([+-]?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?)', line)
-                if found:
-                    try:
-                        energy = float(found[-1])
-                        break
-                    except:
-                        continue
-
-        return energy, natoms
 
 
     def load_qe_output(self, mode):
@@ -640,9 +992,10 @@ class SlabApp(QMainWindow):
         - .out から energy (Ry) と natoms を抽出し、エネルギーは eV に変換して保存する
         """
         try:
-            file, _ = QFileDialog.getOpenFileName(self, "Open QE Output", "", "QE Output (*.out *.out.gz);;All files (*)")
+            file, _ = QFileDialog.getOpenFileName(self, "Open QE Output", self._last_dirs["qe_out"], "QE Output (*.out *.out.gz);;All files (*)")
             if not file:
                 return
+            self._last_dirs["qe_out"] = os.path.dirname(file)
 
             e_Ry, natoms = self._parse_qe_out_file(file)
 
@@ -719,11 +1072,9 @@ class SlabApp(QMainWindow):
             # 面積 A: slab のセルの x-y 面積を使う（self.slab が ase.Atoms で get_cell() を持つ想定）
             if getattr(self, "slab", None) is not None:
                 try:
-                    cell = self.slab.get_cell()
-                    # cell vectors might be array-like 3x3
-                    a = np.array(cell[0])
-                    b = np.array(cell[1])
-                    A = np.linalg.norm(np.cross(a, b))
+                    if self._slab_area_A2 is None:
+                        self._slab_area_A2 = _slab_area(self.slab.cell.array)
+                    A = self._slab_area_A2
                 except Exception as e:
                     self.log_message(f"[Warning] could not get cell from slab object: {e}. Using fallback area=1.0 Å^2")
                     A = 1.0
@@ -742,26 +1093,51 @@ class SlabApp(QMainWindow):
             self.log_message(f"[Error] calculate_surface_energy: {e}")
 
 
+    def _schedule_viewer_update(self, *args):
+        # (re)start the debounce timer; signal arguments are ignored so they are not taken as msec
+        self._viewer_timer.start()
+
     def _viewer_mode_text(self):
         return "Slab" if self.rb_slab.isChecked() else "Bulk"
 
     def update_viewer(self):
+        """
+        Show the current structure (bulk/slab) with the current supercell.
+        Cheap to call redundantly: the scene signature (structure generation, mode, sx, sy, sz)
+        is compared to the one on screen first, and previously rendered scenes come from
+        _viewer_html_cache; py3Dmol only runs for a scene not seen before.
+        """
+        if self.viewer is None:
+            # web view not created yet; _init_webview renders once it is
+            return
         try:
-            atoms = None
+            base = soa = None
             mode = "Bulk"
             if hasattr(self, "rb_slab") and self.rb_slab.isChecked():
                 mode = "Slab"
-            # Viewer: apply supercell only to visualization (not to IN generation)
             if mode == "Bulk" and self.bulk:
-                atoms = self.bulk * (self.super_x.value(), self.super_y.value(), self.super_z.value())
+                base, soa = self.bulk, self._bulk_soa
             elif mode == "Slab" and self.slab:
-                atoms = self.slab * (self.super_x.value(), self.super_y.value(), self.super_z.value())
+                base, soa = self.slab, self._slab_soa
 
-            if atoms:
-                buf = io.StringIO()
-                write(buf, atoms, format="xyz")
-                xyz_str = buf.getvalue()
+            if base:
+                sc = (self.super_x.value(), self.super_y.value(), self.super_z.value())
+                key = (self._structure_gen, mode) + sc
+                # nothing to do if this exact scene is already displayed
+                if key == self._last_viewer_state:
+                    return
+                # reuse a previously rendered scene (entries of older generations just age out)
+                html = self._viewer_html_cache.pop(key, None)
+                if html is not None:
+                    self._viewer_html_cache[key] = html
+                    self.viewer.setHtml(html)
+                    self._last_viewer_state = key
+                    return
 
+                import py3Dmol
+                # Viewer: apply supercell only to visualization (not to IN generation);
+                # formatted straight from the array view, no Atoms * sc or ase.io.write
+                xyz_str = _supercell_xyz(soa, sc)
 
                 view = py3Dmol.view(width=700, height=600)
                 view.addModel(xyz_str, "xyz")
@@ -773,9 +1149,35 @@ class SlabApp(QMainWindow):
                 view.zoomTo()
                 html = view._make_html()
                 self.viewer.setHtml(html)
+                self._last_viewer_state = key
+
+                if len(self._viewer_html_cache) >= _VIEWER_HTML_CACHE_SIZE:
+                    self._viewer_html_cache.pop(next(iter(self._viewer_html_cache)))
+                self._viewer_html_cache[key] = html
         except Exception as e:
             self.log_message(f"[Error] update_viewer: {e}")
 
+    def _list_pseudo_dir(self, folder):
+        """
+        Files in folder as sorted full paths (os.scandir: no extra stat per entry);
+        [] if folder is not an existing directory.
+        Cached until the folder's mtime changes (i.e. files were added/removed/renamed).
+        """
+        try:
+            st = os.stat(folder)
+        except OSError:
+            return []
+        if not stat.S_ISDIR(st.st_mode):
+            return []
+        mtime = st.st_mtime_ns
+        hit = self._pp_dir_cache.get(folder)
+        if hit is not None and hit[0] == mtime:
+            return hit[1]
+        with os.scandir(folder) as it:
+            files = sorted(e.path for e in it if e.is_file())
+        self._pp_dir_cache[folder] = (mtime, files)
+        return files
+
     # Helper: find pseudo files (returns full path for each element)
     def _find_pseudos_for_elements(self, elements, pp_search_folder_hint):
         """
@@ -787,27 +1189,37 @@ class SlabApp(QMainWindow):
         missing = []
 
         candidates = []
-        if pp_search_folder_hint and os.path.isdir(pp_search_folder_hint):
-            candidates = [os.path.join(pp_search_folder_hint, f) for f in os.listdir(pp_search_folder_hint)
-                          if os.path.isfile(os.path.join(pp_search_folder_hint, f))]
-
-        def elem_in_fname(elem, fname):
-            base = os.path.basename(fname)
-            pattern = r'(?<![A-Za-z])' + re.escape(elem) + r'(?![A-Za-z])'
-            return re.search(pattern, base, flags=re.IGNORECASE) is not None
+        if pp_search_folder_hint:
+            candidates = self._list_pseudo_dir(pp_search_folder_hint)
+
+        # element symbol not adjacent to other letters, e.g. 'Fe' in 'Fe.pbe.UPF' or 'pbe_fe_v1.upf';
+        # one pattern for all elements, so each file name is scanned only once
+        buckets = {elem: [] for elem in elements}
+        if candidates and elements:
+            by_lower = {elem.lower(): elem for elem in elements}
+            pattern = re.compile(r'(?<![A-Za-z])(' + '|'.join(re.escape(e) for e in elements) + r')(?![A-Za-z])',
+                                 re.IGNORECASE)
+            for f in candidates:
+                name = os.path.basename(f)
+                # usual convention: the name starts with its element ('Fe.pbe-n-kjpaw_psl.1.0.0.UPF');
+                # settle those with a slice + dict lookup (which also keeps e.g. the '-n-' there
+                # from counting as N) and scan only the remaining names with the regex
+                for n in (2, 1):
+                    lead = by_lower.get(name[:n].lower())
+                    if lead is not None and not name[n:n + 1].isalpha():
+                        buckets[lead].append(f)
+                        break
+                else:
+                    for elem in {by_lower[m.group(1).lower()] for m in pattern.finditer(name)}:
+                        buckets[elem].append(f)
 
-        ext_pref = ['.upf', '.UPF', '.psp', '.PSP', '.psf', '.PSF', '.pseudo', '.PSEUDO', '.dat', '.DAT']
+        def score(fpath):
+            p = _EXT_RANK.get(os.path.splitext(fpath)[1].lower(), len(_EXT_RANK))
+            return (p, len(os.path.basename(fpath)))
 
         for elem in elements:
-            found = [f for f in candidates if elem_in_fname(elem, f)]
+            found = buckets[elem]
             if found:
-                def score(fpath):
-                    _, ext = os.path.splitext(fpath)
-                    try:
-                        p = ext_pref.index(ext)
-                    except ValueError:
-                        p = len(ext_pref)
-                    return (p, len(os.path.basename(fpath)))
                 found.sort(key=score)
                 element_to_full[elem] = found[0]
             else:
@@ -834,45 +1246,39 @@ class SlabApp(QMainWindow):
         if not os.path.isdir(dest_dir):
             os.makedirs(dest_dir, exist_ok=True)
 
-        elem_to_basename = {}
-        for elem, full in elem_to_fullpath.items():
-            basename = os.path.basename(full)
-            dest = os.path.join(dest_dir, basename)
-            if os.path.exists(dest):
+        # one copy per source file, even if several elements (or symlinks) share it
+        elem_to_real = {elem: os.path.realpath(full) for elem, full in elem_to_fullpath.items()}
+        sources = {}  # realpath -> first path given for it
+        for elem, real in elem_to_real.items():
+            sources.setdefault(real, elem_to_fullpath[elem])
+
+        # destination names are chosen here, in element order, so the same session always
+        # gives the same ATOMIC_SPECIES; only the (I/O bound) copies then run in parallel.
+        # Logging stays in this thread.
+        placed = {}
+        claimed = {}  # name -> source, for the names claimed in this call
+        try:
+            for real, full in sources.items():
+                placed[real] = _claim_pseudo_name(full, dest_dir, claimed)
+        except BaseException:
+            # drop the still-empty placeholders
+            for name in claimed:
                 try:
-                    if filecmp.cmp(full, dest, shallow=False):
-                        self.log_message(f"Reusing existing {basename} in {dest_dir}")
-                        elem_to_basename[elem] = basename
-                        continue
-                    else:
-                        base, ext = os.path.splitext(basename)
-                        idx = 1
-                        while True:
-                            newname = f"{base}_{idx}{ext}"
-                            newdest = os.path.join(dest_dir, newname)
-                            if not os.path.exists(newdest):
-                                shutil.copy2(full, newdest)
-                                elem_to_basename[elem] = newname
-                                self.log_message(f"Copied {full} -> {newdest}")
-                                break
-                            idx += 1
-                except Exception:
-                    base, ext = os.path.splitext(basename)
-                    idx = 1
-                    while True:
-                        newname = f"{base}_{idx}{ext}"
-                        newdest = os.path.join(dest_dir, newname)
-                        if not os.path.exists(newdest):
-                            shutil.copy2(full, newdest)
-                            elem_to_basename[elem] = newname
-                            self.log_message(f"Copied {full} -> {newdest}")
-                            break
-                        idx += 1
+                    os.remove(os.path.join(dest_dir, name))
+                except OSError:
+                    pass
+            raise
+        jobs = [(full, os.path.join(dest_dir, name)) for name, full in claimed.items()]
+        if jobs:
+            with ThreadPoolExecutor(max_workers=min(8, len(jobs))) as pool:
+                list(pool.map(lambda job: _copy_into_claimed(*job), jobs))
+        for real, full in sources.items():
+            name, reused = placed[real]
+            if reused:
+                self.log_message(f"Reusing existing {name} in {dest_dir}")
             else:
-                shutil.copy2(full, dest)
-                elem_to_basename[elem] = basename
-                self.log_message(f"Copied {full} -> {dest}")
-        return elem_to_basename
+                self.log_message(f"Copied {full} -> {os.path.join(dest_dir, name)}")
+        return {elem: placed[real][0] for elem, real in elem_to_real.items()}
 
     def generate_qe_input(self, mode="bulk"):
         """
@@ -889,13 +1295,13 @@ class SlabApp(QMainWindow):
                 if self.bulk is None:
                     self.log_message("Error: No bulk structure loaded.")
                     return
-                atoms = self.bulk
+                atoms, soa = self.bulk, self._bulk_soa
                 kpoints = (self.kx.value(), self.ky.value(), self.kz.value())
             elif mode == "slab":
                 if self.slab is None:
                     self.log_message("Error: No slab built.")
                     return
-                atoms = self.slab
+                atoms, soa = self.slab, self._slab_soa
                 if self.override_kpoints.isChecked():
                     kpoints = (self.kx.value(), self.ky.value(), self.kz.value())
                 else:
@@ -914,11 +1320,12 @@ class SlabApp(QMainWindow):
             do_copy = self.copy_pseudos_checkbox.isChecked()
 
             # find pseudos (full paths)
-            symbols = atoms.get_chemical_symbols()
-            unique_symbols = []
-            for s in symbols:
-                if s not in unique_symbols:
-                    unique_symbols.append(s)
+            symbols = soa["symbols"]
+            # first-seen mass per element; its keys double as the ordered unique symbols
+            elem_masses = {}
+            for s, m in zip(symbols, soa["masses"]):
+                elem_masses.setdefault(s, m)
+            unique_symbols = list(elem_masses)
 
             elem_to_full = self._find_pseudos_for_elements(unique_symbols, pp_search_hint)
 
@@ -928,14 +1335,15 @@ class SlabApp(QMainWindow):
             if not file:
                 self.log_message("Saving cancelled.")
                 return
-            in_dir = os.path.dirname(os.path.abspath(file))
+            # the dialog returns absolute paths; only resolve against the cwd otherwise
+            in_dir = os.path.dirname(file if os.path.isabs(file) else os.path.normpath(os.path.join(os.getcwd(), file)))
 
             # determine destination pseudo folder path and behaviour
             if do_copy:
-                # If copying: ensure destination directory exists (absolute or relative to in_dir)
+                # If copying: destination directory is absolute or relative to in_dir
+                # (_copy_pseudos_to_target creates it if needed)
                 if os.path.isabs(pp_input_user):
                     pseudo_dest_dir = pp_input_user
-                    os.makedirs(pseudo_dest_dir, exist_ok=True)
                     try:
                         rel = os.path.relpath(pseudo_dest_dir, in_dir)
                         pseudo_dir_for_in = ("./" + rel) if not rel.startswith("..") else pseudo_dest_dir
@@ -943,7 +1351,6 @@ class SlabApp(QMainWindow):
                         pseudo_dir_for_in = pseudo_dest_dir
                 else:
                     pseudo_dest_dir = os.path.join(in_dir, pp_input_user)
-                    os.makedirs(pseudo_dest_dir, exist_ok=True)
                     if pp_input_user.startswith("./") or pp_input_user.startswith("../"):
                         pseudo_dir_for_in = pp_input_user
                     else:
@@ -966,12 +1373,6 @@ class SlabApp(QMainWindow):
                 elem_to_basename = {elem: os.path.basename(path) for elem, path in elem_to_full.items()}
 
             # build ATOMIC_SPECIES
-            masses = atoms.get_masses()
-            elem_masses = {}
-            for i, s in enumerate(symbols):
-                if s not in elem_masses:
-                    elem_masses[s] = masses[i]
-
             atomic_species_lines = []
             for elem in unique_symbols:
                 mass = elem_masses.get(elem, 0.0)
@@ -980,12 +1381,9 @@ class SlabApp(QMainWindow):
                     raise RuntimeError(f"Pseudopotential not found for element {elem}")
                 atomic_species_lines.append(f"{elem} {mass:.6f} {basename}")
 
-            # positions & cell
-            pos_lines = []
-            for sym, pos in zip(atoms.get_chemical_symbols(), atoms.get_positions()):
-                pos_lines.append(f"{sym} {pos[0]:.8f} {pos[1]:.8f} {pos[2]:.8f}")
-            cell = atoms.get_cell()
-            cell_lines = [f"{cell[i,0]:.8f} {cell[i,1]:.8f} {cell[i,2]:.8f}" for i in range(3)]
+            # cell (formatted in one go; positions are streamed into the buffer below)
+            cell = soa["cell"]
+            cell_block = "\n".join(["%.8f %.8f %.8f"] * 3) % tuple(cell.ravel().tolist())
 
             # QE params
             calculation = self.calculation.currentText()
@@ -1003,41 +1401,46 @@ class SlabApp(QMainWindow):
             nat = len(symbols)
             ntyp = len(unique_symbols)
 
-            # compose input text
-            lines = []
-            lines.append("&CONTROL")
-            lines.append(f"  calculation = '{calculation}',")
-            lines.append(f"  prefix = '{prefix}',")
-            lines.append(f"  outdir = '{outdir}',")
-            lines.append(f"  pseudo_dir = '{pseudo_dir_for_in}',")
-            lines.append("/")
-            lines.append("&SYSTEM")
-            lines.append("  ibrav = 0,")
-            lines.append(f"  nat = {nat},")
-            lines.append(f"  ntyp = {ntyp},")
-            lines.append(f"  ecutwfc = {ecutwfc},")
-            lines.append(f"  ecutrho = {ecutrho},")
+            # compose input text in one buffer (written to the file with a single write)
+            buf = io.StringIO()
+
+            def emit(line):
+                buf.write(line)
+                buf.write("\n")
+
+            emit("&CONTROL")
+            emit(f"  calculation = '{calculation}',")
+            emit(f"  prefix = '{prefix}',")
+            emit(f"  outdir = '{outdir}',")
+            emit(f"  pseudo_dir = '{pseudo_dir_for_in}',")
+            emit("/")
+            emit("&SYSTEM")
+            emit("  ibrav = 0,")
+            emit(f"  nat = {nat},")
+            emit(f"  ntyp = {ntyp},")
+            emit(f"  ecutwfc = {ecutwfc},")
+            emit(f"  ecutrho = {ecutrho},")
             # dispersion
             vdw_corr = self.vdw_corr.currentText()
             if vdw_corr != "none":
-                lines.append(f"  vdw_corr = '{vdw_corr}',")
+                emit(f"  vdw_corr = '{vdw_corr}',")
                 # ⚠ QE では DFT-D3, TS, XDM のとき london は不要
                 if vdw_corr == "DFT-D2":
-                    lines.append("  london = .true.,")
-                    lines.append(f"  london_s6 = {self.london_s6.value()},")
-                    lines.append(f"  london_rcut = {self.london_rcut.value()},")
+                    emit("  london = .true.,")
+                    emit(f"  london_s6 = {self.london_s6.value()},")
+                    emit(f"  london_rcut = {self.london_rcut.value()},")
             
 
             if nspin > 1:
-                lines.append(f"  nspin = {nspin},")
+                emit(f"  nspin = {nspin},")
             if nbnd > 0:
-                lines.append(f"  nbnd = {nbnd},")
-            lines.append(f"  occupations = '{occupations}',")
+                emit(f"  nbnd = {nbnd},")
+            emit(f"  occupations = '{occupations}',")
             if occupations == "smearing":
                 sm_map = {"gaussian": "gaussian", "methfessel-paxton": "methfessel-paxton", "marzari-vanderbilt": "marzari-vanderbilt"}
                 sm = sm_map.get(smearing, "gaussian")
-                lines.append(f"  smearing = '{sm}',")
-                lines.append(f"  degauss = {degauss},")
+                emit(f"  smearing = '{sm}',")
+                emit(f"  degauss = {degauss},")
             # starting_magnetization: only if nspin==2 and user provided non-zero for some species
             if nspin == 2:
                 starting_vals = [self.start_mag_1.value(), self.start_mag_2.value(), self.start_mag_3.value()]
@@ -1045,28 +1448,27 @@ class SlabApp(QMainWindow):
                     if idx >= ntyp:
                         break
                     if abs(val) > 1e-12:
-                        lines.append(f"  starting_magnetization({idx+1}) = {val},")
-            lines.append("/")
-            lines.append("&ELECTRONS")
-            lines.append(f"  conv_thr = {conv_thr},")
-            lines.append("/\n")
-
-            lines.append("ATOMIC_SPECIES")
-            lines += atomic_species_lines
-            lines.append("\nCELL_PARAMETERS angstrom")
-            lines += cell_lines
-            lines.append("\nATOMIC_POSITIONS angstrom")
-            lines += pos_lines
+                        emit(f"  starting_magnetization({idx+1}) = {val},")
+            emit("/")
+            emit("&ELECTRONS")
+            emit(f"  conv_thr = {conv_thr},")
+            emit("/\n")
+
+            emit("ATOMIC_SPECIES")
+            for line in atomic_species_lines:
+                emit(line)
+            emit("\nCELL_PARAMETERS angstrom")
+            emit(cell_block)
+            emit("\nATOMIC_POSITIONS angstrom")
+            buf.writelines(_atom_row_chunks(symbols, soa["pos"]))
 
             kx, ky, kz = kpoints
-            lines.append("\nK_POINTS automatic")
-            lines.append(f"{kx} {ky} {kz} 0 0 0")
-
-            input_text = "\n".join(lines)
+            emit("\nK_POINTS automatic")
+            emit(f"{kx} {ky} {kz} 0 0 0")
 
             # write .in
             with open(file, "w") as f:
-                f.write(input_text)
+                f.write(buf.getvalue())
 
             self.log_message(f"QE input ({mode}) saved to: {file}")
             if do_copy:
@@ -1080,6 +1482,8 @@ class SlabApp(QMainWindow):
             self.log_message(f"[Error] generate_qe_input: {e}")
 
 if __name__ == "__main__":
+    # required because QtWebEngineWidgets is imported after the QApplication is created
+    QCoreApplication.setAttribute(Qt.AA_ShareOpenGLContexts)
     app = QApplication(sys.argv)
     win = SlabApp()
     win.resize(1250, 820)